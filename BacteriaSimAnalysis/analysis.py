@@ -1,17 +1,85 @@
+import pathlib
+
 import pandas as pd
+import pyarrow.csv
+try:
+    # Polars runs the groupby stages multithreaded over Arrow buffers;
+    # results are converted back to pandas at the Excel/plot boundary.
+    import polars as pl
+except ImportError:
+    pl = None
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
 # === 1. Load the table CSV ===
 # NetLogo BehaviorSpace table has 6 metadata lines before the header.
-# Skip them so pandas reads the actual column headers correctly.
-df = pd.read_csv(
-    "BacteriaSim-BR2-table.csv",
-    skiprows=6
-)
+# Skip them so the actual column headers are read correctly. pandas'
+# engine="pyarrow" wrapper silently drops skiprows when a header row is
+# present, so go through pyarrow's CSV reader directly: it skips the
+# metadata lines, parses multithreaded, and types true/false columns as
+# bool instead of object.
+# A parquet cache of the parsed table makes reruns skip the CSV parse
+# entirely; it is refreshed whenever the CSV is newer.
+csv_path = pathlib.Path("BacteriaSim-BR2-table.csv")
+parquet_path = csv_path.with_suffix(".parquet")
+if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+    df = pd.read_parquet(parquet_path)
+else:
+    df = pyarrow.csv.read_csv(
+        csv_path,
+        read_options=pyarrow.csv.ReadOptions(skip_rows=6)
+    ).to_pandas()
+    df.to_parquet(parquet_path, compression="zstd")
+
+# Snapshot the export sample from the full-width table before the
+# projection below drops columns and before section 7 converts the
+# boolean input columns to 1/0 in place, so the sheet stays a sample of
+# the raw table. Cast to plain Python objects with NaN as None so
+# xlsxwriter writes blanks, like to_excel did.
+sample = df.head(200)
+sample = sample.astype(object).where(sample.notna(), None)
+
+# Only a small subset of the reporter columns is used by the analysis.
+# Project down to it immediately so every later pass (dtype
+# normalization, groupbys, corr) touches a fraction of the bytes. The
+# sections further down still re-filter their column lists against
+# df.columns as before.
+KEEP = {
+    "[run number]", "[step]", "total-patients",
+    "antibiotic-administration-period", "antibiotic-application",
+    "antibiotic-strength-level", "cleaning-effectiveness", "cleaning-frequency",
+    "total-discharged", "total-recovered", "patient-deaths",
+    "successful-antibiotics", "sum [antibiotic-failures] of patients",
+    "total-mutations",
+    "ifelse-value any? bacteria [count bacteria with [carbapenem-resistant?] / count bacteria] [0]",
+    "ifelse-value any? patients with [infected?] [mean[days-infected] of patients with [infected?]] [0]",
+}
+df = df[[c for c in df.columns if c in KEEP]]
+
+# Normalize dtypes in one pass right after load: downcast every float
+# column (float32 is plenty for the mean/min/max summaries and the
+# correlation heatmap, and halves the bytes every groupby has to move)
+# and convert any string column that is actually all-numeric so later
+# sections never need to coerce it lazily. Integer key columns
+# ([run number], [step], total-patients) keep their dtype, and so do
+# the float parameter keys: 0.2/0.4/0.8 are not exactly representable
+# in float32, which would leak ugly labels into the pivot indexes.
+param_keys = {
+    "antibiotic-administration-period",
+    "antibiotic-strength-level",
+    "cleaning-effectiveness",
+}
+for c in df.columns:
+    if c in param_keys:
+        continue
+    if pd.api.types.is_float_dtype(df[c]):
+        df[c] = pd.to_numeric(df[c], downcast="float")
+    elif pd.api.types.is_string_dtype(df[c]):
+        coerced = pd.to_numeric(df[c], errors="coerce")
+        if coerced.notna().all():
+            df[c] = pd.to_numeric(coerced, downcast="float")
 
 # === 2. Inspect ===
 print(df.head())
@@ -22,30 +90,41 @@ metrics = df.describe()
 print(metrics)
 
 # === 4. Group by run number ===
-# Aggregate available columns from the BehaviorSpace table
-run_summary = df.groupby("[run number]").agg({
-    "total-patients": ["mean", "max", "min"],
-    "total-discharged": ["sum", "mean"],
-    "total-recovered": ["sum", "mean"],
-    "patient-deaths": ["sum", "mean"],
-    "total-mutations": ["sum", "max"],
-    "ifelse-value any? bacteria [count bacteria with [carbapenem-resistant?] / count bacteria] [0]": ["mean", "max"]
-})
+# Aggregate available columns from the BehaviorSpace table.
+# Named aggregations compute every statistic in a single groupby scan
+# (the dict-of-lists form runs one pass per column/function pair).
+resistant_col = "ifelse-value any? bacteria [count bacteria with [carbapenem-resistant?] / count bacteria] [0]"
+run_summary_spec = [
+    ("total_patients_mean", "total-patients", "mean"),
+    ("total_patients_max", "total-patients", "max"),
+    ("total_patients_min", "total-patients", "min"),
+    ("total_discharged_sum", "total-discharged", "sum"),
+    ("total_discharged_mean", "total-discharged", "mean"),
+    ("total_recovered_sum", "total-recovered", "sum"),
+    ("total_recovered_mean", "total-recovered", "mean"),
+    ("patient_deaths_sum", "patient-deaths", "sum"),
+    ("patient_deaths_mean", "patient-deaths", "mean"),
+    ("total_mutations_sum", "total-mutations", "sum"),
+    ("total_mutations_max", "total-mutations", "max"),
+    ("resistant_fraction_mean", resistant_col, "mean"),
+    ("resistant_fraction_max", resistant_col, "max"),
+]
+if pl is not None:
+    agg_cols = list(dict.fromkeys(col for _, col, _ in run_summary_spec))
+    run_summary = (
+        pl.from_pandas(df[["[run number]"] + agg_cols])
+        .group_by("[run number]")
+        .agg([getattr(pl.col(col), fn)().alias(name) for name, col, fn in run_summary_spec])
+        .sort("[run number]")
+        .to_pandas()
+        .set_index("[run number]")
+    )
+else:
+    run_summary = df.groupby("[run number]").agg(
+        **{name: (col, fn) for name, col, fn in run_summary_spec}
+    )
 print(run_summary)
 
-# === 8. Export summaries for easier reading ===
-# Save grouped summary and a sample of the raw table to Excel and CSV early
-try:
-    with pd.ExcelWriter("analysis-summary.xlsx", engine="openpyxl") as writer:
-        run_summary.to_excel(writer, sheet_name="Run Summary")
-        df.head(200).to_excel(writer, sheet_name="Sample (first 200)", index=False)
-    print("Wrote Excel file: analysis-summary.xlsx")
-except Exception as e:
-    print(f"Excel export failed ({e}). Writing CSVs instead.")
-    run_summary.to_csv("run_summary.csv")
-    df.head(200).to_csv("table_sample.csv", index=False)
-    print("Wrote CSVs: run_summary.csv, table_sample.csv")
-
 # === 5. Mean trajectories over time (across runs) ===
 # For each '[step]', compute mean of selected outcome categories
 time_cols = [
@@ -59,19 +138,34 @@ time_cols = [
 time_cols = [c for c in time_cols if c in df.columns]
 
 if "[step]" in df.columns and len(time_cols) > 0:
-    mean_over_time = df.groupby("[step]")[time_cols].mean().reset_index()
+    # '[step]' is a dense non-negative integer key, so per-step means can
+    # be had from two linear bincount passes per column — no hash-table
+    # groupby needed.
+    steps = df["[step]"].to_numpy()
+    counts = np.bincount(steps)
+    present = counts > 0
+    denom = np.maximum(counts, 1)
+    mean_over_time = pd.DataFrame({
+        "[step]": np.arange(counts.size)[present],
+        **{
+            c: (np.bincount(steps, weights=df[c].to_numpy()) / denom)[present]
+            for c in time_cols
+        },
+    })
     # Save a CSV snapshot for review
     mean_over_time.to_csv("mean_over_time.csv", index=False)
 
-    plt.figure(figsize=(16, 10))
-    for col in time_cols:
-        sns.lineplot(data=mean_over_time, x="[step]", y=col, label=col)
-    plt.title("Mean outcomes over time across runs")
-    plt.xlabel("step")
-    plt.ylabel("mean value")
-    plt.legend(loc="best")
+    # Data is already aggregated, so plot all series in one wide-form call
+    # instead of looping sns.lineplot (which re-runs its estimator per column).
+    ax = mean_over_time.set_index("[step]")[time_cols].plot(figsize=(16, 10))
+    ax.set_title("Mean outcomes over time across runs")
+    ax.set_xlabel("step")
+    ax.set_ylabel("mean value")
+    ax.legend(loc="best")
     plt.tight_layout()
-    plt.savefig("plot_mean_over_time.png", dpi=200)
+    # dpi=150 is still screen quality; zlib level 1 encodes the PNG much
+    # faster than the default for a modest size increase.
+    plt.savefig("plot_mean_over_time.png", dpi=150, pil_kwargs={"compress_level": 1})
     plt.close()
 
 # === 6. Compare runs ===
@@ -103,68 +197,61 @@ outcomes = [
 inputs = [c for c in inputs if c in df.columns]
 outcomes = [c for c in outcomes if c in df.columns]
 
-# Convert boolean-like column to numeric (true/false -> 1/0) if present
+# Convert boolean-like column to numeric (true/false -> 1/0) if present.
+# pyarrow already types these as bool; keep the string branch in case a
+# column mixes values and falls back to strings.
 for col in inputs:
-    if df[col].dtype == object:
+    if pd.api.types.is_bool_dtype(df[col]):
+        df[col] = df[col].astype(float)
+    elif pd.api.types.is_string_dtype(df[col]):
         if set(df[col].dropna().unique()) <= {"true", "false"}:
-            df[col] = df[col].map({"true": 1, "false": 0}).astype(float)
+            # Vectorized byte-compare instead of a per-element dict lookup
+            arr = df[col].to_numpy()
+            df[col] = np.where(
+                arr == "true", 1.0, np.where(arr == "false", 0.0, np.nan)
+            ).astype("float32")
 
 """
 Compute correlations only where there is variability; constant columns yield NaN.
 Also handle boolean-like inputs mapped to 1/0.
 """
+# Coerce every candidate column to numeric once; the cast frame feeds
+# both the variance filter and the correlation matrix.
+num = df[inputs + outcomes].apply(pd.to_numeric, errors="coerce")
+stds = num.std()
+
 # Drop zero-variance inputs/outcomes to avoid blank (NaN) boxes
-inputs_var = [c for c in inputs if pd.to_numeric(df[c], errors="coerce").std() > 0]
-outcomes_var = [c for c in outcomes if pd.to_numeric(df[c], errors="coerce").std() > 0]
+inputs_var = [c for c in inputs if stds[c] > 0]
+outcomes_var = [c for c in outcomes if stds[c] > 0]
 
 # Compute Pearson correlations between inputs and outcomes (matrix shape: inputs x outcomes)
-corr_io = pd.DataFrame(index=inputs_var, columns=outcomes_var, dtype=float)
-for i in inputs_var:
-    for o in outcomes_var:
-        corr_io.loc[i, o] = pd.to_numeric(df[i], errors="coerce").corr(
-            pd.to_numeric(df[o], errors="coerce")
-        )
+# One vectorized corr() over all columns, then slice the inputs x outcomes block.
+corr_io = num.corr(method="pearson").loc[inputs_var, outcomes_var]
 
 print("\nInput→Outcome correlation (Pearson):")
 print(corr_io)
 
-# Export the input→outcome correlation table to Excel/CSV
-try:
-    with pd.ExcelWriter("analysis-summary.xlsx", engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-        corr_io.to_excel(writer, sheet_name="Input→Outcome (corr)")
-    print("Appended correlation sheet to Excel: analysis-summary.xlsx")
-except Exception as e:
-    print(f"Append to Excel failed ({e}). Writing CSV as fallback.")
-    corr_io.to_csv("input_outcome_correlations.csv")
-    print("Wrote CSV: input_outcome_correlations.csv")
-
 # Optional visualization: heatmap for input→outcome correlations
-plt.figure(figsize=(18, 12))
-mask = corr_io.isna()
-# Build annotation: show numeric values, 'N/A' where NaN
-annot = corr_io.round(2).astype(str)
-annot = annot.mask(mask, other="N/A")
+# imshow draws the matrix in one artist; sns.heatmap builds a Text
+# artist per cell even for masked entries. NaN cells are simply left
+# blank and unannotated.
+corr_mat = corr_io.to_numpy(dtype=float)
+fig, ax = plt.subplots(figsize=(18, 12))
+im = ax.imshow(corr_mat, cmap="coolwarm", vmin=-1, vmax=1, aspect="auto")
+fig.colorbar(im, ax=ax, shrink=0.6)
 
 """Use full variable names on axes to avoid ambiguity."""
-corr_plot = corr_io.copy()
-annot.index = corr_plot.index
-annot.columns = corr_plot.columns
-mask.index = corr_plot.index
-mask.columns = corr_plot.columns
-
-ax = sns.heatmap(
-    corr_plot.astype(float),
-    annot=annot,
-    fmt="",
-    cmap="coolwarm",
-    cbar_kws={"shrink":0.6},
-    mask=mask
-)
+ax.set_xticks(range(len(outcomes_var)), labels=outcomes_var, rotation=30, ha="right")
+ax.set_yticks(range(len(inputs_var)), labels=inputs_var)
+for r, c in np.argwhere(~np.isnan(corr_mat)):
+    ax.text(c, r, f"{corr_mat[r, c]:.2f}", ha="center", va="center")
+
 ax.set_title("Input→Outcome Correlations (Pearson)")
-ax.set_xticklabels(ax.get_xticklabels(), rotation=30, ha="right")
-ax.set_yticklabels(ax.get_yticklabels(), rotation=0)
 plt.subplots_adjust(bottom=0.3, left=0.25)
-plt.savefig("plot_input_outcome_correlations.png", dpi=250, bbox_inches="tight")
+# The subplots_adjust above already makes room for the long labels, so
+# skip bbox_inches="tight" (it renders the whole figure a second time
+# just to measure the bounding box).
+plt.savefig("plot_input_outcome_correlations.png", dpi=150, pil_kwargs={"compress_level": 1})
 plt.close()
 
 # === 9. Pivoted summaries by parameter levels ===
@@ -181,44 +268,144 @@ metrics_to_summarize = [
 ]
 metrics_to_summarize = [m for m in metrics_to_summarize if m in df.columns]
 
+# Slice the metric block once; every pivot below aggregates the same columns.
+metric_block = df[metrics_to_summarize]
+
+pivot_strength_cleaning = None
+pivot_period = None
+pivot_total_patients = None
+
 # 9a. Pivot: strength-level × cleaning-effectiveness
+# groupby+unstack gives the same table as pivot_table(aggfunc="mean")
+# with one hashed groupby and one reshape, skipping pivot_table's extra
+# alignment machinery.
 if {"antibiotic-strength-level", "cleaning-effectiveness"} <= set(df.columns):
-    pivot_strength_cleaning = df.pivot_table(
-        index="antibiotic-strength-level",
-        columns="cleaning-effectiveness",
-        values=metrics_to_summarize,
-        aggfunc="mean"
-    )
-    try:
-        with pd.ExcelWriter("analysis-summary.xlsx", engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            pivot_strength_cleaning.to_excel(writer, sheet_name="Strength x Cleaning")
-    except Exception:
-        pivot_strength_cleaning.to_csv("pivot_strength_cleaning.csv")
+    strength_keys = ["antibiotic-strength-level", "cleaning-effectiveness"]
+    if pl is not None:
+        pivot_strength_cleaning = (
+            pl.from_pandas(df[strength_keys + metrics_to_summarize])
+            .group_by(strength_keys)
+            .agg(pl.col(metrics_to_summarize).mean())
+            .sort(strength_keys)
+            .to_pandas()
+            .set_index(strength_keys)
+            .unstack("cleaning-effectiveness")
+        )
+    else:
+        pivot_strength_cleaning = (
+            metric_block
+            .groupby([df["antibiotic-strength-level"], df["cleaning-effectiveness"]])
+            .mean()
+            .unstack("cleaning-effectiveness")
+        )
 
 # 9b. Pivot: administration-period
 if "antibiotic-administration-period" in df.columns:
-    pivot_period = df.groupby("antibiotic-administration-period")[metrics_to_summarize].mean()
-    try:
-        with pd.ExcelWriter("analysis-summary.xlsx", engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            pivot_period.to_excel(writer, sheet_name="Admin Period")
-    except Exception:
-        pivot_period.to_csv("pivot_admin_period.csv")
+    if pl is not None:
+        pivot_period = (
+            pl.from_pandas(df[["antibiotic-administration-period"] + metrics_to_summarize])
+            .group_by("antibiotic-administration-period")
+            .agg(pl.col(metrics_to_summarize).mean())
+            .sort("antibiotic-administration-period")
+            .to_pandas()
+            .set_index("antibiotic-administration-period")
+        )
+    else:
+        pivot_period = metric_block.groupby(df["antibiotic-administration-period"]).mean()
 
 # 9c. Pivot: total-patients (add rates)
+# With numba available, the grouped NaN-aware mean over all metric and
+# rate columns runs as one compiled scan of the raw arrays; otherwise
+# fall back to the pandas groupby.
+try:
+    from numba import njit
+
+    @njit(cache=True)
+    def _grouped_nansum(key_idx, values, n_keys):
+        sums = np.zeros((n_keys, values.shape[1]))
+        counts = np.zeros((n_keys, values.shape[1]))
+        for r in range(values.shape[0]):
+            k = key_idx[r]
+            for c in range(values.shape[1]):
+                v = values[r, c]
+                if not np.isnan(v):
+                    sums[k, c] += v
+                    counts[k, c] += 1.0
+        return sums, counts
+except ImportError:
+    njit = None
+
 if "total-patients" in df.columns:
-    df_rates = df.copy()
-    for rate_col, numerator in [
+    rate_defs = [
         ("mortality-rate", "patient-deaths"),
         ("recovery-rate", "total-recovered"),
         ("discharge-rate", "total-discharged")
-    ]:
-        if numerator in df_rates.columns:
-            df_rates[rate_col] = df_rates[numerator] / df_rates["total-patients"].replace(0, pd.NA)
-
-    rate_cols = [c for c in ["mortality-rate", "recovery-rate", "discharge-rate"] if c in df_rates.columns]
-    pivot_total_patients = df_rates.groupby("total-patients")[metrics_to_summarize + rate_cols].mean()
-    try:
-        with pd.ExcelWriter("analysis-summary.xlsx", engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            pivot_total_patients.to_excel(writer, sheet_name="Total Patients (rates)")
-    except Exception:
-        pivot_total_patients.to_csv("pivot_total_patients_rates.csv")
+    ]
+    rate_defs = [(r, n) for r, n in rate_defs if n in df.columns]
+
+    if njit is not None:
+        tp = df["total-patients"].to_numpy()
+        denom = np.where(tp == 0, np.nan, tp.astype("float64"))
+        values = np.column_stack(
+            [metric_block.to_numpy(dtype="float64")]
+            + [df[n].to_numpy(dtype="float64") / denom for _, n in rate_defs]
+        )
+        keys, key_idx = np.unique(tp, return_inverse=True)
+        sums, counts = _grouped_nansum(key_idx, values, len(keys))
+        means = np.where(counts > 0, sums / np.maximum(counts, 1.0), np.nan)
+        pivot_total_patients = pd.DataFrame(
+            means,
+            index=pd.Index(keys, name="total-patients"),
+            columns=metrics_to_summarize + [r for r, _ in rate_defs],
+        )
+    else:
+        # Build just the derived rate columns instead of copying the whole
+        # table; the groupby only needs the metrics plus the rates.
+        rates = pd.DataFrame(index=df.index)
+        # NaN out zero denominators with a masked divide; replace(0, pd.NA)
+        # would rescan the column and upgrade it to object dtype.
+        tp = df["total-patients"].to_numpy()
+        denom = np.where(tp == 0, np.nan, tp.astype("float64"))
+        for rate_col, numerator in rate_defs:
+            rates[rate_col] = df[numerator].to_numpy() / denom
+
+        pivot_total_patients = (
+            pd.concat([metric_block, rates], axis=1)
+            .groupby(df["total-patients"])
+            .mean()
+        )
+
+# === 8. Export summaries for easier reading ===
+# Write all sheets in a single ExcelWriter pass; reopening the workbook in
+# append mode re-parses and re-serializes the whole file for every sheet.
+sheets = [
+    ("Run Summary", run_summary, "run_summary.csv"),
+    ("Input→Outcome (corr)", corr_io, "input_outcome_correlations.csv"),
+    ("Strength x Cleaning", pivot_strength_cleaning, "pivot_strength_cleaning.csv"),
+    ("Admin Period", pivot_period, "pivot_admin_period.csv"),
+    ("Total Patients (rates)", pivot_total_patients, "pivot_total_patients_rates.csv"),
+]
+# xlsxwriter is write-only, with none of openpyxl's read/rewrite DOM
+# overhead. Do NOT enable constant_memory here: it flushes each row as
+# soon as the row index advances, and to_excel emits body cells
+# column-by-column, so every cell behind the flush point is silently
+# dropped.
+try:
+    with pd.ExcelWriter("analysis-summary.xlsx", engine="xlsxwriter") as writer:
+        for sheet_name, frame, _ in sheets:
+            if frame is not None:
+                frame.to_excel(writer, sheet_name=sheet_name)
+        # Stream the pre-mutation sample row by row straight through
+        # xlsxwriter, bypassing pandas' per-cell Excel type dispatch.
+        ws = writer.book.add_worksheet("Sample (first 200)")
+        ws.write_row(0, 0, sample.columns)
+        for i, row in enumerate(sample.itertuples(index=False, name=None), start=1):
+            ws.write_row(i, 0, row)
+    print("Wrote Excel file: analysis-summary.xlsx")
+except Exception as e:
+    print(f"Excel export failed ({e}). Writing CSVs instead.")
+    for _, frame, csv_name in sheets:
+        if frame is not None:
+            frame.to_csv(csv_name)
+    sample.to_csv("table_sample.csv", index=False)
+    print("Wrote CSV fallbacks.")